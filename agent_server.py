@@ -1,106 +1,257 @@
 #!/usr/bin/env python3
-import base64, json, os, subprocess, sys, time, uuid, threading
-from http import HTTPStatus
+import binascii, dataclasses, gzip, json, os, queue, re, selectors, subprocess, sys, tempfile, time, uuid, threading
+from concurrent.futures import ThreadPoolExecutor
 from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
 from urllib.parse import parse_qs, urlparse
 
-JOBS_DIR = Path("/tmp/gdriscv_jobs")
+try:
+    import orjson
+    _dumps, _loads = orjson.dumps, orjson.loads
+except ImportError:
+    orjson = None
+    def _dumps(obj): return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=dataclasses.asdict).encode("utf-8")
+    _loads = json.loads
+
+try:
+    import ctypes
+    _fallocate = ctypes.CDLL(None, use_errno=True).fallocate
+    _fallocate.argtypes = (ctypes.c_int, ctypes.c_int, ctypes.c_longlong, ctypes.c_longlong)
+except (ImportError, OSError, AttributeError, TypeError):
+    _fallocate = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+if msgspec is not None:
+    class ExecReq(msgspec.Struct):
+        cmd: str = ""; cmd_b64: str = ""; timeout_sec: int = 0; cwd: str = "."; env: dict = {}
+    class StatusReq(msgspec.Struct):
+        job_id: str = ""; tail_lines: int = 50
+    _DECODERS = {"/exec": msgspec.json.Decoder(ExecReq), "/async_exec": msgspec.json.Decoder(ExecReq),
+        "/async_status": msgspec.json.Decoder(StatusReq)}
+else:
+    _DECODERS = {}
+
+_JOBS = {}; _JOBS_LOCK = threading.Lock()
+_MAX_JOBS = 64
+_JOB_STREAM_MAX = 8 << 20; _JOB_STREAM_KEEP = 4 << 20; _JOBS_MAX_BYTES = 64 << 20
+_PUNCH_HOLE = 0x03  # FALLOC_FL_PUNCH_HOLE | FALLOC_FL_KEEP_SIZE
+_JAVAMAP_RE = re.compile(r"([^=,]*)=([^,]*)")
+_CHUNK = 1 << 20
+_B64_BLOCK = 4 << 18
+_PARALLEL_STAT_MIN = 256
+_STAT_POOL = ThreadPoolExecutor(max_workers=16, thread_name_prefix="agent-stat")  # shared; threads start lazily
+_SHELL_PREFIX = ("/bin/bash", "-lc") if os.path.exists("/bin/bash") else ("/bin/sh", "-lc")
+_ENV_BASE = dict(os.environ)
+
+@dataclasses.dataclass(slots=True)
+class Entry:
+    name: str; is_dir: bool; size: int; mtime: int
 
 def _json_bytes(obj):
-    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return _dumps(obj)
 
 def _now_ms():
-    return int(time.time() * 1000)
+    return time.monotonic_ns() // 1_000_000
 
-def _is_within(child, base):
-    try:
-        child.resolve().relative_to(base.resolve())
-        return True
-    except Exception:
-        return False
+def _wall_ms():
+    return time.time_ns() // 1_000_000
 
 def _pick_shell_cmd(cmd):
-    if Path("/bin/bash").exists():
-        return ["/bin/bash", "-lc", cmd]
-    return ["/bin/sh", "-lc", cmd]
+    return [*_SHELL_PREFIX, cmd]
+
+def _child_env(extra):
+    if not extra: return _ENV_BASE
+    return {**_ENV_BASE, **{str(k):str(v) for k,v in extra.items()}}
 
 def _parse_body(body):
-    text = body.decode("utf-8", errors="replace").strip()
-    if not text: return {}
+    if not body.strip(): return {}
     try:
-        obj = json.loads(text)
+        obj = _loads(body)
         if isinstance(obj, dict): return obj
     except: pass
+    text = body.decode("utf-8", errors="replace").strip()
     if text.startswith("{") and text.endswith("}") and "=" in text:
-        inner = text[1:-1].strip()
-        out = {}
-        for part in inner.split(","):
-            part = part.strip()
-            if "=" in part:
-                k, v = part.split("=", 1)
-                out[k.strip()] = v.strip()
-        return out
+        return {k.strip(): v.strip() for k, v in _JAVAMAP_RE.findall(text[1:-1])}
     return {}
 
+def _write_payload(t, payload):
+    v = payload.get("content_b64")
+    if payload.get("encoding") != "gzip+base64": return _b64_to_file(t, v)
+    data = _b64dec(v)
+    if data is None: return None
+    data = gzip.decompress(data); t.write_bytes(data); return len(data)
+
+def _decode_body(path, body):
+    dec = _DECODERS.get(path)
+    if dec is not None and body.lstrip()[:1] in (b"{", b"["):
+        try: return msgspec.structs.asdict(dec.decode(body))
+        except msgspec.MsgspecError: pass
+    return _parse_body(body)
+
 def _b64dec(v):
     if not isinstance(v, str) or not v: return None
-    try: return base64.b64decode(v.encode("ascii"), validate=False)
-    except: return None
+    try: return binascii.a2b_base64(v)
+    except (binascii.Error, ValueError): return None
+
+def _b64_to_file(t, v):
+    if isinstance(v, str) and len(v) > _B64_BLOCK and v.isascii() and not len(v) % 4:
+        blocks = range(0, len(v), _B64_BLOCK)
+        # validate every block before opening, so bad base64 never touches an existing target
+        try:
+            for i in blocks: binascii.a2b_base64(v[i:i+_B64_BLOCK])
+            valid = True
+        except binascii.Error: valid = False
+        if valid:
+            with open(t, "wb") as f:
+                for i in blocks: f.write(binascii.a2b_base64(v[i:i+_B64_BLOCK]))
+                return f.tell()
+    data = _b64dec(v)
+    if data is None: return None
+    t.write_bytes(data); return len(data)
+
+def _mem_fd(name):
+    if hasattr(os, "memfd_create"): return os.memfd_create(name)
+    fd, path = tempfile.mkstemp(prefix=f"{name}_"); os.unlink(path)
+    return fd
+
+def _read_fd(fd):
+    return os.pread(fd, os.fstat(fd).st_size, 0).decode("utf-8", errors="replace")
+
+def _tail_fd(fd, n, floor=0):
+    size = os.fstat(fd).st_size; window = 1 << 16
+    while True:
+        start = max(size - window, floor)
+        lines = os.pread(fd, size - start, start).decode("utf-8", errors="replace").splitlines()
+        if start == floor or len(lines) > n: return "\n".join(lines[-n:])
+        window <<= 2
 
-def _run_job(job_id, cmd, timeout, cwd, env):
-    d = JOBS_DIR / job_id
-    d.mkdir(parents=True, exist_ok=True)
-    (d / "status").write_text("running")
+def _new_job(job_id):
+    job = {"status":"running","exit_code":None,"done":threading.Event(),
+        "stdout":_mem_fd(f"job_{job_id}_out"),"stderr":_mem_fd(f"job_{job_id}_err"),"stdout_floor":0,"stderr_floor":0}
+    with _JOBS_LOCK: _JOBS[job_id] = job; _evict_jobs_locked()
+    return job
+
+def _job_bytes(job):
+    return sum(os.fstat(job[k]).st_size - job[k + "_floor"] for k in ("stdout", "stderr"))
+
+def _evict_jobs_locked():
+    done = [k for k, j in _JOBS.items() if j["status"] == "done"]
+    total = sum(map(_job_bytes, _JOBS.values()))
+    while done and (len(_JOBS) > _MAX_JOBS or total > _JOBS_MAX_BYTES):
+        old = _JOBS.pop(done.pop(0)); total -= _job_bytes(old); os.close(old["stdout"]); os.close(old["stderr"])
+
+def _trim_job(job):
+    # drop all but the newest output once a stream passes its cap; readers never go below the floor
+    if _fallocate is None: return
+    for k in ("stdout", "stderr"):
+        fd = job[k]; size = os.fstat(fd).st_size
+        if size - job[k + "_floor"] <= _JOB_STREAM_MAX: continue
+        with _JOBS_LOCK:
+            start, job[k + "_floor"] = job[k + "_floor"], size - _JOB_STREAM_KEEP
+            _fallocate(fd, _PUNCH_HOLE, start, job[k + "_floor"] - start)
+
+def _run_job(job, cmd, timeout, cwd, env):
     try:
-        with open(d / "stdout", "w") as fo, open(d / "stderr", "w") as fe:
-            p = subprocess.Popen(_pick_shell_cmd(cmd), cwd=str(cwd),
-                env={**os.environ, **env}, stdout=fo, stderr=fe)
-            try:
-                rc = p.wait(timeout=timeout)
+        p = subprocess.Popen(_pick_shell_cmd(cmd), cwd=str(cwd), env=_child_env(env),
+            stdout=job["stdout"], stderr=job["stderr"])
+        deadline = time.monotonic() + timeout
+        while True:
+            try: rc = p.wait(timeout=0.2); break
             except subprocess.TimeoutExpired:
-                p.kill(); rc = -9
-        (d / "exit_code").write_text(str(rc))
-        (d / "status").write_text("done")
+                if time.monotonic() >= deadline: p.kill(); p.wait(); rc = -9; break
+                _trim_job(job)
     except Exception as e:
-        (d / "stderr").write_text(str(e))
-        (d / "exit_code").write_text("-1")
-        (d / "status").write_text("done")
+        os.write(job["stderr"], str(e).encode("utf-8")); rc = -1
+    _trim_job(job)
+    with _JOBS_LOCK: job["exit_code"] = rc; job["status"] = "done"
+    job["done"].set()
+
+class PooledHTTPServer(ThreadingHTTPServer):
+    """ThreadingHTTPServer that hands requests to a fixed set of daemon workers."""
+    def __init__(self, addr, handler, max_workers=32):
+        super().__init__(addr, handler)
+        self._queue = queue.SimpleQueue(); self._workers = max_workers
+        for i in range(max_workers):
+            threading.Thread(target=self._work, name=f"agent-{i}", daemon=True).start()
+    def _work(self):
+        while (item := self._queue.get()) is not None: self.process_request_thread(*item)
+    def process_request(self, request, client_address):
+        self._queue.put((request, client_address))
+    def backlogged(self): return not self._queue.empty()
+    def server_close(self):
+        super().server_close()
+        for _ in range(self._workers): self._queue.put(None)
 
 class Handler(BaseHTTPRequestHandler):
     server_version = "gdriscv-agent/0.2"
+    protocol_version = "HTTP/1.1"
+    wbufsize = 1 << 16
+    idle_timeout = 15
     def log_message(self, fmt, *a):
         if not getattr(self.server, "quiet", False): super().log_message(fmt, *a)
     @property
-    def base_dir(self): return Path(getattr(self.server, "base_dir", os.getcwd()))
+    def base_dir(self): return self.server.base_dir_resolved
+    def handle(self):
+        self.close_connection = True
+        self.handle_one_request()
+        while not self.close_connection and self._next_ready(): self.handle_one_request()
+    def _next_ready(self):
+        # an idle keep-alive socket only holds its worker briefly, and never while others queue
+        self.connection.settimeout(0)
+        try:
+            if self.rfile.peek(1): return True
+        except OSError: return False
+        finally: self.connection.settimeout(self.timeout)
+        with selectors.DefaultSelector() as sel:
+            sel.register(self.connection, selectors.EVENT_READ)
+            deadline = time.monotonic() + self.idle_timeout
+            while not self.server.backlogged() and (left := deadline - time.monotonic()) > 0:
+                if sel.select(min(left, 0.25)): return True
+        return False
+    def _head(self, status, ct, length):
+        self.log_request(status)
+        return (f"{self.protocol_version} {status} {self.responses[status][0]}\r\n"
+            f"Server: {self.version_string()}\r\nDate: {self.date_time_string()}\r\n"
+            f"Content-Type: {ct}\r\nContent-Length: {length}\r\n"
+            f"Connection: {'close' if self.close_connection else 'keep-alive'}\r\n\r\n").encode("latin-1")
     def _json(self, status, obj):
-        body = _json_bytes(obj)
-        self.send_response(status); self.send_header("Content-Type","application/json")
-        self.send_header("Content-Length",str(len(body))); self.end_headers(); self.wfile.write(body)
+        self._bytes(status, _json_bytes(obj), "application/json")
     def _bytes(self, status, data, ct="application/octet-stream"):
-        self.send_response(status); self.send_header("Content-Type",ct)
-        self.send_header("Content-Length",str(len(data))); self.end_headers(); self.wfile.write(data)
+        head = self._head(status, ct, len(data))
+        if len(data) < _CHUNK: self.wfile.write(head + data)
+        else: self.wfile.write(head); self.wfile.write(data)
+    def _file(self, t):
+        with open(t, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            self.wfile.write(self._head(200, "application/octet-stream", size)); self.wfile.flush()
+            self.connection.sendfile(f, 0, size)
     def _body(self):
         n = int(self.headers.get("Content-Length") or "0")
         return self.rfile.read(n) if n > 0 else b""
     def _resolve(self, raw):
-        base = self.base_dir.resolve(); t = (base / raw.lstrip("/")).resolve()
-        if not _is_within(t, base): raise ValueError("path escapes base")
+        base = self.base_dir; t = (base / raw.lstrip("/")).resolve()
+        if os.path.commonpath([t, base]) != str(base): raise ValueError("path escapes base")
         return t
 
     def do_GET(self):
         p = urlparse(self.path)
         if p.path == "/health":
-            return self._json(200, {"ok":True,"version":"0.2","cwd":str(self.base_dir.resolve()),
-                "python":sys.version.split()[0],"time_ms":_now_ms()})
+            return self._bytes(200, self.server.health_prefix + str(_wall_ms()).encode() + b"}", "application/json")
         if p.path == "/ls":
             qs = parse_qs(p.query); raw = (qs.get("path") or [""])[0]
             try:
                 t = self._resolve(raw or ".")
                 if not t.exists(): return self._json(404,{"ok":False,"error":"not_found"})
                 if not t.is_dir(): return self._json(400,{"ok":False,"error":"not_a_directory"})
-                entries = [{"name":x.name,"is_dir":x.is_dir(),"size":x.stat().st_size,"mtime":int(x.stat().st_mtime)}
-                    for x in sorted(t.iterdir(), key=lambda x:(not x.is_dir(),x.name))]
+                with os.scandir(t) as it: raw_entries = sorted(it, key=lambda e:(not e.is_dir(),e.name))
+                if len(raw_entries) > _PARALLEL_STAT_MIN:
+                    stats = list(_STAT_POOL.map(os.DirEntry.stat, raw_entries))
+                else: stats = [e.stat() for e in raw_entries]
+                entries = [Entry(e.name, e.is_dir(), st.st_size, int(st.st_mtime)) for e, st in zip(raw_entries, stats)]
                 return self._json(200,{"ok":True,"path":raw,"entries":entries})
             except Exception as e: return self._json(400,{"ok":False,"error":str(e)})
         if p.path == "/read":
@@ -108,14 +259,16 @@ class Handler(BaseHTTPRequestHandler):
             try:
                 t = self._resolve(raw)
                 if not t.exists() or not t.is_file(): return self._json(404,{"ok":False,"error":"not_found"})
-                return self._json(200,{"ok":True,"path":raw,"content_b64":base64.b64encode(t.read_bytes()).decode()})
+                if (qs.get("binary") or [""])[0] not in ("", "0", "false"): return self._file(t)
+                b64 = binascii.b2a_base64(t.read_bytes(), newline=False)
+                return self._bytes(200, b'{"ok":true,"path":' + _dumps(raw) + b',"content_b64":"' + b64 + b'"}', "application/json")
             except Exception as e: return self._json(400,{"ok":False,"error":str(e)})
         if p.path == "/download":
             qs = parse_qs(p.query); raw = (qs.get("path") or [""])[0]
             try:
                 t = self._resolve(raw)
                 if not t.exists() or not t.is_file(): return self._json(404,{"ok":False,"error":"not_found"})
-                return self._bytes(200, t.read_bytes())
+                return self._file(t)
             except Exception as e: return self._json(400,{"ok":False,"error":str(e)})
         self._json(404,{"ok":False,"error":"not_found"})
 
@@ -123,35 +276,45 @@ class Handler(BaseHTTPRequestHandler):
         p = urlparse(self.path)
         if p.path == "/upload":
             qs = parse_qs(p.query); raw = (qs.get("path") or [""])[0]
-            if not raw: return self._json(400,{"ok":False,"error":"missing path"})
+            if not raw: self.close_connection = True; return self._json(400,{"ok":False,"error":"missing path"})
             try:
                 t = self._resolve(raw); t.parent.mkdir(parents=True,exist_ok=True)
-                data = self._body(); t.write_bytes(data)
-                return self._json(200,{"ok":True,"path":raw,"bytes":len(data)})
-            except Exception as e: return self._json(400,{"ok":False,"error":str(e)})
-        self._json(404,{"ok":False,"error":"not_found"})
+                remaining = int(self.headers.get("Content-Length") or "0"); total = 0
+                fd = os.open(str(t), os.O_WRONLY|os.O_CREAT|os.O_TRUNC, 0o644)
+                try:
+                    while remaining > 0:
+                        chunk = self.rfile.read(min(_CHUNK, remaining))
+                        if not chunk: break
+                        os.write(fd, chunk); remaining -= len(chunk); total += len(chunk)
+                finally: os.close(fd)
+                return self._json(200,{"ok":True,"path":raw,"bytes":total})
+            except Exception as e: self.close_connection = True; return self._json(400,{"ok":False,"error":str(e)})
+        self.close_connection = True; self._json(404,{"ok":False,"error":"not_found"})
 
     def do_POST(self):
         p = urlparse(self.path)
-        payload = _parse_body(self._body())
+        payload = _decode_body(p.path, self._body())
 
         if p.path == "/upload":
             raw = payload.get("path")
             if not isinstance(raw,str) or not raw: return self._json(400,{"ok":False,"error":"missing path"})
             try:
                 t = self._resolve(raw); t.parent.mkdir(parents=True,exist_ok=True)
-                data = _b64dec(payload.get("content_b64")) or b""
-                t.write_bytes(data); return self._json(200,{"ok":True,"path":raw,"bytes":len(data)})
+                n = _write_payload(t, payload)
+                if n is None: t.write_bytes(b""); n = 0
+                return self._json(200,{"ok":True,"path":raw,"bytes":n})
             except Exception as e: return self._json(400,{"ok":False,"error":str(e)})
 
         if p.path == "/write":
             raw = payload.get("path")
             if not isinstance(raw,str) or not raw: return self._json(400,{"ok":False,"error":"missing path"})
-            data = _b64dec(payload.get("content_b64"))
-            if data is None: return self._json(400,{"ok":False,"error":"missing content_b64"})
+            v = payload.get("content_b64")
+            if not isinstance(v,str) or not v: return self._json(400,{"ok":False,"error":"missing content_b64"})
             try:
                 t = self._resolve(raw); t.parent.mkdir(parents=True,exist_ok=True)
-                t.write_bytes(data); return self._json(200,{"ok":True,"path":raw,"bytes":len(data)})
+                n = _write_payload(t, payload)
+                if n is None: return self._json(400,{"ok":False,"error":"missing content_b64"})
+                return self._json(200,{"ok":True,"path":raw,"bytes":n})
             except Exception as e: return self._json(400,{"ok":False,"error":str(e)})
 
         if p.path == "/exec":
@@ -165,19 +328,20 @@ class Handler(BaseHTTPRequestHandler):
             env_extra = payload.get("env") or {}
             if not isinstance(env_extra,dict): env_extra = {}
             started = _now_ms()
+            fo, fe = _mem_fd("exec_out"), _mem_fd("exec_err")
             try:
-                pr = subprocess.run(_pick_shell_cmd(cmd), cwd=str(cwd),
-                    env={**os.environ,**{str(k):str(v) for k,v in env_extra.items()}},
-                    capture_output=True, timeout=timeout)
-                return self._json(200,{"ok":True,"exit_code":pr.returncode,
-                    "stdout":pr.stdout.decode("utf-8",errors="replace"),
-                    "stderr":pr.stderr.decode("utf-8",errors="replace"),"duration_ms":_now_ms()-started})
-            except subprocess.TimeoutExpired as e:
-                return self._json(200,{"ok":False,"error":"timeout","duration_ms":_now_ms()-started,
-                    "stdout":(e.stdout or b"").decode("utf-8",errors="replace"),
-                    "stderr":(e.stderr or b"").decode("utf-8",errors="replace")})
+                pr = subprocess.Popen(_pick_shell_cmd(cmd), cwd=str(cwd), env=_child_env(env_extra), stdout=fo, stderr=fe)
+                try:
+                    rc = pr.wait(timeout=timeout)
+                except subprocess.TimeoutExpired:
+                    pr.kill(); pr.wait()
+                    return self._json(200,{"ok":False,"error":"timeout","duration_ms":_now_ms()-started,
+                        "stdout":_read_fd(fo),"stderr":_read_fd(fe)})
+                return self._json(200,{"ok":True,"exit_code":rc,
+                    "stdout":_read_fd(fo),"stderr":_read_fd(fe),"duration_ms":_now_ms()-started})
             except Exception as e:
                 return self._json(500,{"ok":False,"error":str(e),"duration_ms":_now_ms()-started})
+            finally: os.close(fo); os.close(fe)
 
         if p.path == "/async_exec":
             cmd = payload.get("cmd")
@@ -190,28 +354,44 @@ class Handler(BaseHTTPRequestHandler):
             env_extra = payload.get("env") or {}
             if not isinstance(env_extra,dict): env_extra = {}
             job_id = str(uuid.uuid4())[:8]
-            t = threading.Thread(target=_run_job, args=(job_id, cmd, timeout, cwd,
-                {str(k):str(v) for k,v in env_extra.items()}), daemon=True)
+            t = threading.Thread(target=_run_job, args=(_new_job(job_id), cmd, timeout, cwd, env_extra), daemon=True)
             t.start()
             return self._json(200,{"ok":True,"job_id":job_id,"status":"running"})
 
         if p.path == "/async_status":
             job_id = payload.get("job_id","")
             if not job_id: return self._json(400,{"ok":False,"error":"missing job_id"})
-            d = JOBS_DIR / job_id
-            if not d.exists(): return self._json(404,{"ok":False,"error":"job not found"})
-            status = (d/"status").read_text().strip() if (d/"status").exists() else "unknown"
-            ec = None
-            if (d/"exit_code").exists():
-                try: ec = int((d/"exit_code").read_text().strip())
-                except: ec = -1
             tail = int(payload.get("tail_lines",50) or 50)
-            def _tail(f, n):
-                if not f.exists(): return ""
-                lines = f.read_text(errors="replace").splitlines()
-                return "\n".join(lines[-n:])
-            return self._json(200,{"ok":True,"status":status,"exit_code":ec,
-                "stdout_tail":_tail(d/"stdout",tail),"stderr_tail":_tail(d/"stderr",tail)})
+            with _JOBS_LOCK:
+                job = _JOBS.get(job_id)
+                if job is None: return self._json(404,{"ok":False,"error":"job not found"})
+                status, ec = job["status"], job["exit_code"]
+                out, err = _tail_fd(job["stdout"], tail, job["stdout_floor"]), _tail_fd(job["stderr"], tail, job["stderr_floor"])
+            return self._json(200,{"ok":True,"status":status,"exit_code":ec,"stdout_tail":out,"stderr_tail":err})
+
+        if p.path == "/async_status_wait":
+            job_id = payload.get("job_id","")
+            if not job_id: return self._json(400,{"ok":False,"error":"missing job_id"})
+            try:
+                since = max(0, int(payload.get("since",0) or 0))
+                w = payload.get("wait"); wait = max(0.0, min(30.0 if w is None else float(w), 60.0))
+            except (TypeError, ValueError): return self._json(400,{"ok":False,"error":"bad since/wait"})
+            with _JOBS_LOCK: job = _JOBS.get(job_id)
+            if job is None: return self._json(404,{"ok":False,"error":"job not found"})
+            deadline = _now_ms() + int(wait * 1000)
+            while (_now_ms() < deadline and os.fstat(job["stdout"]).st_size <= since and not self.server.backlogged()
+                and not job["done"].wait(0.2)): pass
+            with _JOBS_LOCK:
+                if _JOBS.get(job_id) is not job: return self._json(404,{"ok":False,"error":"job not found"})
+                status, ec = job["status"], job["exit_code"]
+                size = os.fstat(job["stdout"]).st_size; since = max(since, job["stdout_floor"])
+                chunk = os.pread(job["stdout"], min(size - since, _CHUNK), since) if size > since else b""
+                if since + len(chunk) < size: status, ec = "running", None
+                # hand out whole lines while the job runs so multi-byte characters are not split
+                if status != "done" and b"\n" in chunk: chunk = chunk[:chunk.rfind(b"\n") + 1]
+                err = _tail_fd(job["stderr"], 50, job["stderr_floor"]) if status == "done" else ""
+            return self._json(200,{"ok":True,"status":status,"exit_code":ec,"next":since + len(chunk),
+                "stdout":chunk.decode("utf-8",errors="replace"),"stderr_tail":err})
 
         if p.path == "/tmux/create":
             name = payload.get("name","sess")
@@ -238,6 +418,16 @@ class Handler(BaseHTTPRequestHandler):
             r = subprocess.run(["tmux","capture-pane","-t",name,"-p","-S",f"-{lines}"], capture_output=True)
             return self._json(200,{"ok":True,"output":r.stdout.decode("utf-8",errors="replace")})
 
+        if p.path == "/tmux/capture_multi":
+            names = payload.get("names")
+            if not isinstance(names,list): return self._json(400,{"ok":False,"error":"missing names"})
+            lines = int(payload.get("lines",200) or 200)
+            outputs = {}
+            for name in names:
+                r = subprocess.run(["tmux","capture-pane","-t",str(name),"-p","-S",f"-{lines}"], capture_output=True)
+                outputs[str(name)] = r.stdout.decode("utf-8",errors="replace")
+            return self._json(200,{"ok":True,"outputs":outputs})
+
         if p.path == "/tmux/kill":
             name = payload.get("name","sess")
             subprocess.run(["tmux","kill-session","-t",name], capture_output=True)
@@ -250,9 +440,12 @@ def main():
     port = int(os.environ.get("AGENT_PORT","11434"))
     base_dir = os.environ.get("AGENT_BASE_DIR") or os.getcwd()
     quiet = os.environ.get("AGENT_QUIET","0") == "1"
-    httpd = ThreadingHTTPServer((host,port), Handler)
-    httpd.base_dir = base_dir; httpd.quiet = quiet
-    if not quiet: print(f"[agent] listening on http://{host}:{port} (base_dir={Path(base_dir).resolve()})", flush=True)
+    workers = int(os.environ.get("AGENT_MAX_WORKERS","32"))
+    httpd = PooledHTTPServer((host,port), Handler, workers)
+    httpd.base_dir = base_dir; httpd.base_dir_resolved = Path(base_dir).resolve(); httpd.quiet = quiet
+    httpd.health_prefix = (b'{"ok":true,"version":"0.2","cwd":' + _dumps(str(httpd.base_dir_resolved))
+        + b',"python":' + _dumps(sys.version.split()[0]) + b',"time_ms":')
+    if not quiet: print(f"[agent] listening on http://{host}:{port} (base_dir={httpd.base_dir_resolved})", flush=True)
     try: httpd.serve_forever()
     except KeyboardInterrupt: return 0
 
@@ -1,13 +1,35 @@
 """gdriscv Remote AI Dev GUI v2 - Ollama channel only (port 11434, no rate limit)."""
-import base64, json, os, re, threading, time, traceback, tkinter as tk
+import atexit, base64, functools, gzip, importlib.util, json, os, random, re, threading, time, traceback, tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
 from tkinter import ttk, scrolledtext
-import requests
+import httpx
+try:
+    import orjson
+    _dumps, _loads = orjson.dumps, orjson.loads
+except ImportError:
+    def _dumps(obj): return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+    _loads = json.loads
+_HTTP2 = importlib.util.find_spec("h2") is not None  # httpx only negotiates HTTP/2 when h2 is installed
 
 LOGFILE = os.path.join(os.path.expanduser("~"), "gdriscv_debug.log")
 
+_LOGF = open(LOGFILE, "a", encoding="utf-8", buffering=8192)
+_LOG_LOCK = threading.Lock()
+atexit.register(_LOGF.close)
+
 def _dbg(msg):
-    with open(LOGFILE, "a", encoding="utf-8") as f:
-        f.write(f"[{time.strftime('%H:%M:%S')}] {msg}\n")
+    with _LOG_LOCK:
+        _LOGF.write(f"[{time.strftime('%H:%M:%S')}] {msg}\n"); _LOGF.flush()
+
+def _b64(s):
+    return base64.b64encode(s.encode("utf-8")).decode("ascii")
+
+@functools.lru_cache(maxsize=256)
+def _b64_keys(s):
+    # only tmux keystrokes repeat; commands may carry the sudo password or API keys, so never cache them
+    return _b64(s)
+
+GZIP_MIN_BYTES = 1024
 
 class RemoteAPI:
     """All calls go through Ollama channel (https://xxx.gdriscv.com -> device:11434)."""
@@ -15,51 +37,80 @@ class RemoteAPI:
         self.base = ollama_url.rstrip("/")
         self.headers = {"X-API-KEY": api_key, "Content-Type": "application/json"}
         self.timeout = 120
+        limits = httpx.Limits(max_connections=4, max_keepalive_connections=4)
+        self.client = httpx.Client(headers=self.headers, timeout=self.timeout, http2=_HTTP2, limits=limits,
+                                   follow_redirects=True)
+        self._hot = {p: httpx.URL(self._url(p)) for p in ("/async_status", "/async_status_wait", "/tmux/capture_multi")}
+        self._hot_headers = self.client.headers.copy()
+        self._hot_ext = {"timeout": httpx.Timeout(self.timeout).as_dict()}
+
+    def close(self): self.client.close()
 
     def _url(self, path): return f"{self.base}{path}"
 
     def _unwrap(self, resp):
         resp.raise_for_status()
-        return resp.json()
+        return _loads(resp.content)
+
+    def _post(self, path, body): return self._post_raw(path, _dumps(body))
+
+    def _post_raw(self, path, content):
+        return self._unwrap(self.client.post(self._url(path), content=content))
+
+    def _post_hot(self, path, body):
+        req = httpx.Request("POST", self._hot[path], headers=self._hot_headers, content=_dumps(body), extensions=self._hot_ext)
+        return self._unwrap(self.client.send(req))
 
     def health(self):
-        return self._unwrap(requests.get(self._url("/health"), headers=self.headers, timeout=self.timeout))
+        return self._unwrap(self.client.get(self._url("/health")))
 
     def exec(self, cmd, timeout_sec=60):
-        body = {"cmd_b64": base64.b64encode(cmd.encode()).decode(), "timeout_sec": timeout_sec}
-        return self._unwrap(requests.post(self._url("/exec"), headers=self.headers, json=body, timeout=self.timeout))
+        body = {"cmd_b64": _b64(cmd), "timeout_sec": timeout_sec}
+        return self._post("/exec", body)
 
     def write_file(self, path, content):
-        body = {"path": path, "content_b64": base64.b64encode(content.encode()).decode()}
-        return self._unwrap(requests.post(self._url("/write"), headers=self.headers, json=body, timeout=self.timeout))
+        raw = content.encode()
+        gz = len(raw) > GZIP_MIN_BYTES
+        b64 = base64.b64encode(gzip.compress(raw, compresslevel=6) if gz else raw); del raw
+        # assembled as bytes so the base64 payload is never copied into a str and re-encoded
+        body = b'{"path":' + _dumps(path) + b',"content_b64":"' + b64 + (b'","encoding":"gzip+base64"}' if gz else b'"}')
+        return self._post_raw("/write", body)
 
     def read_file(self, path):
-        r = self._unwrap(requests.get(self._url("/read"), headers=self.headers, params={"path": path}, timeout=self.timeout))
+        r = self._unwrap(self.client.get(self._url("/read"), params={"path": path}))
         return base64.b64decode(r.get("content_b64", "")).decode(errors="replace")
 
     def async_exec(self, cmd, timeout_sec=3600):
-        body = {"cmd_b64": base64.b64encode(cmd.encode()).decode(), "timeout_sec": timeout_sec}
-        return self._unwrap(requests.post(self._url("/async_exec"), headers=self.headers, json=body, timeout=self.timeout))
+        body = {"cmd_b64": _b64(cmd), "timeout_sec": timeout_sec}
+        return self._post("/async_exec", body)
 
     def async_status(self, job_id, tail_lines=50):
         body = {"job_id": job_id, "tail_lines": tail_lines}
-        return self._unwrap(requests.post(self._url("/async_status"), headers=self.headers, json=body, timeout=self.timeout))
+        return self._post_hot("/async_status", body)
+
+    def async_status_wait(self, job_id, since=0, wait=30):
+        body = {"job_id": job_id, "since": since, "wait": wait}
+        return self._post_hot("/async_status_wait", body)
 
     def tmux_create(self, name, width=200, height=50):
         body = {"name": name, "width": width, "height": height}
-        return self._unwrap(requests.post(self._url("/tmux/create"), headers=self.headers, json=body, timeout=self.timeout))
+        return self._post("/tmux/create", body)
 
     def tmux_send(self, name, keys, enter=True):
-        body = {"name": name, "keys_b64": base64.b64encode(keys.encode()).decode(), "enter": enter}
-        return self._unwrap(requests.post(self._url("/tmux/send"), headers=self.headers, json=body, timeout=self.timeout))
+        body = {"name": name, "keys_b64": _b64_keys(keys) if len(keys) <= 4096 else _b64(keys), "enter": enter}
+        return self._post("/tmux/send", body)
 
     def tmux_capture(self, name, lines=200):
         body = {"name": name, "lines": lines}
-        return self._unwrap(requests.post(self._url("/tmux/capture"), headers=self.headers, json=body, timeout=self.timeout))
+        return self._post("/tmux/capture", body)
+
+    def tmux_capture_multi(self, names, lines=200):
+        body = {"names": list(names), "lines": lines}
+        return self._post_hot("/tmux/capture_multi", body)
 
     def tmux_kill(self, name):
         body = {"name": name}
-        return self._unwrap(requests.post(self._url("/tmux/kill"), headers=self.headers, json=body, timeout=self.timeout))
+        return self._post("/tmux/kill", body)
 
 class TmuxSession:
     def __init__(self, api, name):
@@ -74,8 +125,11 @@ class TmuxSession:
     def kill(self):
         self.api.tmux_kill(self.name)
 
+_ANSI_RE = re.compile(r'\x1b[\[\(][0-9;]*[a-zA-Z]|\x1b[=>]')
+_CR_TABLE = str.maketrans('', '', '\r')
+
 def strip_ansi(text):
-    return re.sub(r'\x1b[\[\(][0-9;]*[a-zA-Z]|\x1b[=>]|\r', '', text)
+    return _ANSI_RE.sub('', text).translate(_CR_TABLE)
 
 AGENT_INSTALL_CMD = (
     'curl -fsSL https://raw.githubusercontent.com/niver2002/gdriscv-remote-cli/main/agent_server.py'
@@ -84,23 +138,43 @@ AGENT_INSTALL_CMD = (
     ' nohup python3 ~/agent_server.py > /tmp/agent.log 2>&1 &'
 )
 
+POLL_MIN, POLL_MAX = 0.4, 5.0
+HIDDEN_POLL = 10.0
+TERM_MAX_LINES = 500
+
 CONF_FILE = os.path.join(os.path.expanduser("~"), ".gdriscv_gui.json")
 
+_CONF_CACHE = {"mtime": None, "data": {}}
+
 def _load_conf():
-    try:
-        with open(CONF_FILE, "r") as f: return json.load(f)
-    except: return {}
+    try: mtime = os.stat(CONF_FILE).st_mtime_ns
+    except OSError: return {}
+    if mtime != _CONF_CACHE["mtime"]:
+        try:
+            with open(CONF_FILE, "r") as f: data = json.load(f)
+        except: data = {}
+        _CONF_CACHE.update(mtime=mtime, data=data)
+    return dict(_CONF_CACHE["data"])
 
 def _save_conf(d):
-    old = _load_conf(); old.update(d)
-    with open(CONF_FILE, "w") as f: json.dump(old, f)
+    data = _load_conf(); data.update(d)
+    with open(CONF_FILE, "w") as f: json.dump(data, f, separators=(",", ":"))
+    _CONF_CACHE.update(mtime=os.stat(CONF_FILE).st_mtime_ns, data=data)
+
+def _log_failure(fut):
+    if not fut.cancelled() and fut.exception() is not None:
+        _dbg("".join(traceback.format_exception(fut.exception())))
 
 class GdriscvGUI:
     def __init__(self):
         self.api = None
         self.sessions = {}
-        self.poll_running = {}
+        self.poll_running = False
+        self._stop, self._wake = threading.Event(), threading.Event()
         self._bashrc_exports = ""
+        self._pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="gdr")
+        self._pending_update, self._update_scheduled = {}, False
+        self._pending_lock = threading.Lock()
         self.root = tk.Tk()
         self.root.title("gdriscv Remote AI Dev v2")
         self.root.geometry("960x660")
@@ -124,6 +198,8 @@ class GdriscvGUI:
     def _clear(self):
         for w in self.container.winfo_children(): w.destroy()
     def _bg(self, fn, *a):
+        self._pool.submit(fn, *a).add_done_callback(_log_failure)
+    def _thread(self, fn, *a):
         threading.Thread(target=fn, args=a, daemon=True).start()
     def _after(self, fn, *a):
         self.root.after(0, fn, *a)
@@ -200,8 +276,9 @@ class GdriscvGUI:
 
     def _start_init(self):
         self.btn_start_init.config(state="disabled")
-        self._sudo_pwd = self.inp_sudopwd.get()
-        self._bg(self._run_init)
+        pwd = self.inp_sudopwd.get()
+        # built once per run and handed to the init thread, never kept on the object
+        self._thread(self._run_init, f'echo {json.dumps(pwd)} | sudo -S bash -c ' if pwd else 'sudo -n bash -c ')
 
     def _log(self, msg):
         def do():
@@ -220,40 +297,41 @@ class GdriscvGUI:
         if err: self._log(f"[stderr] {err}")
         return r
 
-    def _async_exec_wait(self, cmd, label="", poll_interval=3):
+    def _async_exec_wait(self, cmd, label=""):
         self._log(f"$ {cmd}")
         r = self.api.async_exec(cmd)
         if not r.get("ok"):
             self._log(f"[ERROR] async_exec failed: {r.get('error', r)}"); return r
         job_id = r["job_id"]
         self._log(f"[job {job_id}] started{' — ' + label if label else ''}")
-        last_len = 0
+        since, pending = 0, ""
         while True:
-            time.sleep(poll_interval)
-            s = self.api.async_status(job_id, tail_lines=80)
-            lines = s.get("stdout_tail", "").splitlines()
-            if len(lines) > last_len:
-                for line in lines[last_len:]: self._log(line)
-                last_len = len(lines)
+            # the agent holds this request until new output arrives or the job ends
+            s = self.api.async_status_wait(job_id, since)
+            since = s.get("next", since)
+            text = pending + s.get("stdout", "")
+            cut = text.rfind("\n") + 1
+            for line in text[:cut].splitlines(): self._log(line)
+            pending = text[cut:]
             if s.get("status") == "done":
+                if pending.strip(): self._log(pending)
                 err = s.get("stderr_tail", "").strip()
                 if err: self._log(f"[stderr] {err}")
                 self._log(f"[job {job_id}] done (exit_code={s.get('exit_code',-1)})")
                 return s
 
-    def _sudo_cmd(self, cmd):
-        pwd = self._sudo_pwd
-        return f'echo {json.dumps(pwd)} | sudo -S bash -c {json.dumps(cmd)}' if pwd else f'sudo -n bash -c {json.dumps(cmd)}'
-
-    def _run_init(self):
+    def _run_init(self, sudo_prefix):
+        def sudo(cmd): return sudo_prefix + json.dumps(cmd)
         try:
             self._log("=== Installing tmux ===")
-            self._async_exec_wait(self._sudo_cmd("apt-get update -qq && apt-get install -y tmux"), label="apt install tmux")
+            self._async_exec_wait(sudo("apt-get update -qq && apt-get install -y tmux"), label="apt install tmux")
 
             # Node.js 22 for riscv64 from unofficial-builds
             self._log("\n=== Installing Node.js 22 (riscv64 unofficial-builds) ===")
-            r = self._exec_log("node --version 2>/dev/null || echo NONE")
-            node_ver = r.get("stdout", "").strip()
+            r = self._exec_log('printf "NODE:%s\\nCLAUDE:%s\\nCODEX:%s\\n" "$(node --version 2>/dev/null||echo NONE)" '
+                               '"$(which claude 2>/dev/null||echo NONE)" "$(which codex 2>/dev/null||echo NONE)"')
+            probe = dict(re.findall(r"^(NODE|CLAUDE|CODEX):(.*)$", r.get("stdout", ""), re.M))
+            node_ver, claude_path, codex_path = (probe.get(k, "NONE").strip() or "NONE" for k in ("NODE", "CLAUDE", "CODEX"))
             need_node = "NONE" in node_ver or (node_ver.startswith("v") and int(node_ver.split(".")[0][1:]) < 20)
             if need_node:
                 self._async_exec_wait(
@@ -271,14 +349,12 @@ class GdriscvGUI:
             self._exec_log("npm config set registry https://registry.npmmirror.com")
 
             self._log("\n=== Installing Claude CLI ===")
-            r = self._exec_log("which claude 2>/dev/null || echo NOT_FOUND")
-            if "NOT_FOUND" in r.get("stdout", ""):
-                self._async_exec_wait(self._sudo_cmd("npm install -g @anthropic-ai/claude-code"), label="npm install claude-code")
+            if claude_path == "NONE":
+                self._async_exec_wait(sudo("npm install -g @anthropic-ai/claude-code"), label="npm install claude-code")
 
             self._log("\n=== Installing Codex CLI ===")
-            r = self._exec_log("which codex 2>/dev/null || echo NOT_FOUND")
-            if "NOT_FOUND" in r.get("stdout", ""):
-                self._async_exec_wait(self._sudo_cmd("npm install -g @openai/codex"), label="npm install codex")
+            if codex_path == "NONE":
+                self._async_exec_wait(sudo("npm install -g @openai/codex"), label="npm install codex")
 
             self._log("\n=== Initialization complete ===")
         except Exception as e:
@@ -317,9 +393,9 @@ class GdriscvGUI:
                 if okey: lines.append(f'export OPENAI_API_KEY="{okey}"')
                 if ourl: lines.append(f'export OPENAI_BASE_URL="{ourl}"')
                 self._bashrc_exports = "\n".join(lines)
-                # Remove old entries and append new
-                self.api.exec("sed -i '/ANTHROPIC_API_KEY\\|ANTHROPIC_BASE_URL\\|OPENAI_API_KEY\\|OPENAI_BASE_URL/d' ~/.bashrc")
-                self.api.exec(f"cat >> ~/.bashrc << 'GDRISCV_EOF'\n{self._bashrc_exports}\nGDRISCV_EOF")
+                # Remove old entries and append new, in one remote shell
+                self.api.exec("sed -i '/ANTHROPIC_API_KEY\\|ANTHROPIC_BASE_URL\\|OPENAI_API_KEY\\|OPENAI_BASE_URL/d' ~/.bashrc; "
+                              f"cat >> ~/.bashrc << 'GDRISCV_EOF'\n{self._bashrc_exports}\nGDRISCV_EOF")
                 self._after(self._set_status_key, "Keys saved!")
                 self.root.after(500, self.build_stage4)
             except Exception as e:
@@ -336,6 +412,7 @@ class GdriscvGUI:
         nb = ttk.Notebook(self.container)
         nb.pack(fill="both", expand=True, pady=4)
         self.term_widgets = {}
+        self._last_lines = {}
         tabs = [("claude", "Claude CLI", "source ~/.bashrc && claude"),
                 ("codex", "Codex CLI", "source ~/.bashrc && codex"),
                 ("shell", "Shell", "")]
@@ -353,8 +430,14 @@ class GdriscvGUI:
             inp.pack(side="left", fill="x", expand=True, padx=(4,0))
             inp.bind("<Return>", lambda e, n=name: self._on_term_send(n))
             self.term_widgets[name] = (txt, inp)
+        self._active_tab = tabs[0][0]
+        nb.bind("<<NotebookTabChanged>>", lambda e: self._on_tab_changed(tabs[nb.index(nb.select())][0]))
         self._bg(self._init_sessions, tabs)
 
+    def _on_tab_changed(self, name):
+        # wake the poller so the newly shown tab is captured now, not after the current backoff
+        self._active_tab = name; self._wake.set()
+
     def _on_term_send(self, name):
         _, inp_w = self.term_widgets[name]
         text = inp_w.get().strip()
@@ -372,26 +455,63 @@ class GdriscvGUI:
             sess.create()
             self.sessions[name] = sess
             if start_cmd: sess.send_keys(start_cmd)
-            self.poll_running[name] = True
-            self._bg(self._poll_loop, name)
-
-    def _poll_loop(self, name):
-        last = ""
-        while self.poll_running.get(name):
+        self.poll_running = True
+        self._thread(self._poll_loop_all, [name for name, _, _ in tabs])
+
+    def _poll_loop_all(self, names):
+        tabs = {self.sessions[n].name: n for n in names}
+        last, fetched, interval, prev_active = {}, {}, POLL_MIN, None
+        while self.poll_running:
+            active, now = self._active_tab, time.monotonic()
+            if active != prev_active: interval, prev_active = POLL_MIN, active
+            # hidden tabs only get a slow heartbeat so they aren't stale when selected
+            want = [s for s, n in tabs.items() if n == active or now - fetched.get(n, float("-inf")) >= HIDDEN_POLL]
             try:
-                raw = self.sessions[name].capture()
-                cleaned = strip_ansi(raw).rstrip()
-                if cleaned != last:
-                    last = cleaned
-                    self._after(self._update_term, name, cleaned)
+                outputs = self.api.tmux_capture_multi(want).get("outputs", {})
+                changed = False
+                for sess_name, raw in outputs.items():
+                    name = tabs.get(sess_name)
+                    if name is None: continue
+                    fetched[name] = now
+                    cleaned = strip_ansi(raw).rstrip()
+                    if cleaned != last.get(name):
+                        last[name] = cleaned; changed = True
+                        self._queue_update(name, cleaned)
+                interval = POLL_MIN if changed else min(interval * 1.5, POLL_MAX)
             except Exception: pass
-            time.sleep(0.8)
+            self._wake.wait(interval + random.uniform(-0.1, 0.1)); self._wake.clear()
+            if self._stop.is_set(): break
+
+    def _queue_update(self, name, text):
+        # coalesce: only the newest text per tab is kept until Tk is idle again
+        with self._pending_lock:
+            self._pending_update[name] = text
+            if self._update_scheduled: return
+            self._update_scheduled = True
+        self.root.after_idle(self._flush_pending)
+
+    def _flush_pending(self):
+        with self._pending_lock:
+            pending, self._pending_update = self._pending_update, {}
+            self._update_scheduled = False
+        for name, text in pending.items(): self._update_term(name, text)
 
     def _update_term(self, name, text):
         txt_w, _ = self.term_widgets[name]
+        # trim before diffing so the stored lines line up with the next capture
+        old, new = self._last_lines.get(name, []), text.split("\n")[-TERM_MAX_LINES:]
+        i, n = 0, min(len(old), len(new))
+        while i < n and old[i] == new[i]: i += 1
+        if i == len(old) == len(new): return
         txt_w.config(state="normal")
-        txt_w.delete("1.0", "end")
-        txt_w.insert("1.0", text)
+        if i == 0:
+            txt_w.delete("1.0", "end")
+            txt_w.insert("1.0", "\n".join(new))
+        else:
+            # keep the unchanged leading lines, replace only the tail
+            txt_w.delete(f"{i}.end", "end")
+            if i < len(new): txt_w.insert("end", "\n" + "\n".join(new[i:]))
+        self._last_lines[name] = new
         txt_w.see("end")
         txt_w.config(state="disabled")
 
@@ -400,10 +520,12 @@ class GdriscvGUI:
         self.root.mainloop()
 
     def _on_close(self):
-        for n in list(self.poll_running): self.poll_running[n] = False
+        self.poll_running = False; self._stop.set(); self._wake.set()
         for s in self.sessions.values():
             try: s.kill()
             except: pass
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        if self.api: self.api.close()
         self.root.destroy()
 
 if __name__ == "__main__":